@@ -2,19 +2,45 @@ from typing import List, Dict
 import sys
 import os
 from collections import UserDict
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 import pickle
+import re
+import json
+import io
+import gc
+from contextlib import contextmanager
+import mmap
 
 # Base class for contact fields
 class Field:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
     def __str__(self):
         return str(self.value)
 
+    # Creating a field from already validated data, skipping __init__ checks
+    @classmethod
+    def _from_trusted(cls, value):
+        field = object.__new__(cls)
+        field.value = value
+        return field
+
+    def __reduce__(self):
+        return (self.__class__._from_trusted, (self.value,))
+
+    # Older versions pickled fields with a __dict__ of {"value": ...}
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            state = state["value"]
+        self.value = state
+
 # Class to store the contact name
 class Name(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         if not value:
             raise ValueError("Name cannot be empty")
@@ -22,6 +48,8 @@ class Name(Field):
 
 # Class to store and validate the phone number
 class Phone(Field):
+    __slots__ = ()
+
     def __init__(self, value):
         if not self.validate_phone(value):
             raise ValueError("Phone number must be 10 digits")
@@ -29,64 +57,107 @@ class Phone(Field):
 
     @staticmethod
     def validate_phone(value):
-        return value.isdigit() and len(value) == 10
+        return len(value) == 10 and value.isdigit()
+
+# Accepted birthday format, the same inputs strptime('%d.%m.%Y') takes
+_BIRTHDAY_RE = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4})", re.ASCII)
 
 # Class to store the birthday date
 class Birthday(Field):
+    __slots__ = ()
+
     def __init__(self, value):
+        match = _BIRTHDAY_RE.fullmatch(value)
         try:
-            self.value = datetime.strptime(value, '%d.%m.%Y')
+            if not match:
+                raise ValueError
+            day, month, year = match.groups()
+            self.value = date(int(year), int(month), int(day))
         except ValueError:
             raise ValueError("Invalid date format. Use DD.MM.YYYY")
     
     def __str__(self):
         return self.value.strftime('%d.%m.%Y')
 
-# Class representing a record in the address book
+# Class representing a record in the address book.
+# Once a record is in an AddressBook, change it through the book's add_phone,
+# remove_phone, edit_phone and add_birthday so the change is saved.
 class Record:
     def __init__(self, name):
         self.name = Name(name)
-        self.phones = []
+        self.phones = {}
         self.birthday = None
 
     # Adding a phone number
     def add_phone(self, phone):
-        self.phones.append(Phone(phone))
+        self.phones[phone] = Phone(phone)
 
     # Removing a phone number
     def remove_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                self.phones.remove(p)
-                return True
-        return False
+        return self.phones.pop(phone, None) is not None
 
     # Editing a phone number
     def edit_phone(self, old_phone, new_phone):
-        for i, p in enumerate(self.phones):
-            if p.value == old_phone:
-                self.phones[i] = Phone(new_phone)
-                return True
-        return False
+        if old_phone not in self.phones:
+            return False
+        if new_phone != old_phone and new_phone in self.phones:
+            raise ValueError("Phone number already exists")
+        new = Phone(new_phone)
+        # Rebuild the dict so the edited number keeps its position
+        self.phones = {
+            (new_phone if number == old_phone else number): (new if number == old_phone else phone)
+            for number, phone in self.phones.items()
+        }
+        return True
 
     # Searching for a phone number
     def find_phone(self, phone):
-        for p in self.phones:
-            if p.value == phone:
-                return p
-        return None
+        return self.phones.get(phone)
+
+    # Converting phones pickled as a list by older versions
+    def __setstate__(self, state):
+        if isinstance(state.get("phones"), list):
+            state["phones"] = {p.value: p for p in state["phones"]}
+        self.__dict__.update(state)
     
     # Adding a birthday date
     def add_birthday(self, birthday):
         self.birthday = Birthday(birthday)
 
     def __str__(self):
-        return f"Contact name: {self.name.value}, phones: {'; '.join(p.value for p in self.phones)}, birthday: {self.birthday}"
+        return f"Contact name: {self.name.value}, phones: {'; '.join(self.phones.keys())}, birthday: {self.birthday}"
+
+# Days to add to a birthday falling on each weekday (Saturday and Sunday move to Monday)
+WEEKEND_SHIFT = (0, 0, 0, 0, 0, 2, 1)
 
 # Address book class
 class AddressBook(UserDict):
+    # Set when the book has changes that are not in the saved snapshot yet
+    _dirty = False
+    # Path of the journal file that changes are appended to, if any
+    _journal = None
+    # Names grouped by birthday (month, day), built on the first birthdays query
+    _bday_index = None
+    # Number of the saved snapshot; journal entries from older snapshots are skipped
+    _generation = 0
+
     def add_record(self, record):
-        self.data[record.name.value] = record
+        name = record.name.value
+        if name in self.data:
+            self._unindex_birthday(name, self.data[name].birthday)
+        self.data[name] = record
+        self._index_birthday(name, record.birthday)
+        self._changed("add_record", name=name, **self._record_to_plain(record))
+
+    # Dict-style writes go through add_record and delete so they are tracked too
+    def __setitem__(self, name, record):
+        if name != record.name.value:
+            raise ValueError("Record name does not match the key")
+        self.add_record(record)
+
+    def __delitem__(self, name):
+        if not self.delete(name):
+            raise KeyError(name)
 
     # Searching for a contact
     def find(self, name):
@@ -95,38 +166,164 @@ class AddressBook(UserDict):
     # Removing a contact
     def delete(self, name):
         if name in self.data:
+            self._unindex_birthday(name, self.data[name].birthday)
             del self.data[name]
+            self._changed("delete", name=name)
             return True
         return False
-    
+
+    # Changing a contact's phones and birthday through the book to track changes
+    def add_phone(self, record, phone):
+        record.add_phone(phone)
+        self._changed("add_phone", name=record.name.value, phone=phone)
+
+    def remove_phone(self, record, phone):
+        if record.remove_phone(phone):
+            self._changed("remove_phone", name=record.name.value, phone=phone)
+            return True
+        return False
+
+    def edit_phone(self, record, old_phone, new_phone):
+        if record.edit_phone(old_phone, new_phone):
+            self._changed("edit_phone", name=record.name.value, old_phone=old_phone, new_phone=new_phone)
+            return True
+        return False
+
+    def add_birthday(self, record, birthday):
+        old_birthday = record.birthday
+        record.add_birthday(birthday)
+        self._unindex_birthday(record.name.value, old_birthday)
+        self._index_birthday(record.name.value, record.birthday)
+        self._changed("add_birthday", name=record.name.value, birthday=birthday)
+
+    # Keeping the birthday index in step with the records
+    def _index_birthday(self, name, birthday):
+        if self._bday_index is not None and birthday:
+            self._bday_index.setdefault((birthday.value.month, birthday.value.day), []).append(name)
+
+    def _unindex_birthday(self, name, birthday):
+        if self._bday_index is not None and birthday:
+            names = self._bday_index.get((birthday.value.month, birthday.value.day), [])
+            if name in names:
+                names.remove(name)
+
+    def _birthday_index(self):
+        if self._bday_index is None:
+            self._bday_index = {}
+            for name, record in self.data.items():
+                self._index_birthday(name, record.birthday)
+        return self._bday_index
+
+    # Marking the book as changed and appending the change to the journal
+    def _changed(self, op, **fields):
+        self._dirty = True
+        if self._journal:
+            with open(self._journal, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"op": op, "gen": self._generation, **fields}) + "\n")
+
+    # Applying changes from the journal on top of the loaded snapshot
+    def replay_journal(self):
+        try:
+            with open(self._journal, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return
+        if content and not content.endswith(b"\n"):
+            # Drop a line left half-written by an interrupted session,
+            # so the next change does not get appended onto it
+            content = content[:content.rfind(b"\n") + 1]
+            try:
+                with open(self._journal, "rb+") as f:
+                    f.truncate(len(content))
+            except OSError:
+                pass   # Read-only journal: nothing will be appended to it either
+        lines = content.decode("utf-8", errors="replace").splitlines()
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue   # Skip a corrupted line
+            if not isinstance(entry, dict) or "op" not in entry or "name" not in entry:
+                continue
+            try:
+                if entry.get("gen", 0) < self._generation:
+                    continue   # Already in the snapshot, left over from an interrupted save
+                self._apply_journal_entry(entry)
+            except (KeyError, TypeError, ValueError):
+                continue   # Skip an entry with missing or invalid fields
+        if lines:
+            self._dirty = True
+            self._bday_index = None
+
+    def _apply_journal_entry(self, entry):
+        op, name = entry["op"], entry["name"]
+        if op == "add_record":
+            self.data[name] = self._record_from_plain(name, entry)
+        elif op == "delete":
+            self.data.pop(name, None)
+        elif name in self.data:
+            record = self.data[name]
+            if op == "add_phone":
+                record.add_phone(entry["phone"])
+            elif op == "remove_phone":
+                record.remove_phone(entry["phone"])
+            elif op == "edit_phone":
+                record.edit_phone(entry["old_phone"], entry["new_phone"])
+            elif op == "add_birthday":
+                record.add_birthday(entry["birthday"])
+
+    @staticmethod
+    def _record_to_plain(record):
+        return {
+            "phones": list(record.phones),
+            "birthday": str(record.birthday) if record.birthday else None,
+        }
+
+    @staticmethod
+    def _record_from_plain(name, fields):
+        record = Record(name)
+        # Phones were validated before they were saved
+        record.phones = {phone: Phone._from_trusted(phone) for phone in fields["phones"]}
+        if fields["birthday"]:
+            record.add_birthday(fields["birthday"])
+        return record
+
+    # Converting the book to plain strings for storage
+    def to_plain(self):
+        return {name: self._record_to_plain(record) for name, record in self.data.items()}
+
+    # Restoring the book from plain strings
+    @classmethod
+    def from_plain(cls, plain, generation=0):
+        book = cls()
+        book._generation = generation
+        for name, fields in plain.items():
+            book.data[name] = cls._record_from_plain(name, fields)
+        return book
+
+    # Pickling only plain strings instead of the whole object graph
+    def __reduce__(self):
+        return (self.__class__.from_plain, (self.to_plain(), self._generation))
+
     # Getting upcoming birthdays
     def get_upcoming_birthdays(self):
-        today = datetime.now()
+        today = date.today()
+        index = self._birthday_index()
         list_of_birthdays = []
-        
-        for record in self.data.values():
-            if record.birthday:
-                birthday = record.birthday.value
-                birthday_this_year = birthday.replace(year=today.year)        
-                
-                if birthday_this_year < today:
-                    birthday_this_year = birthday_this_year.replace(year=today.year + 1)
-                
-                difference_in_days = (birthday_this_year - today).days
-                
-                if 0 <= difference_in_days <= 7:
-                    # Check if the birthday falls on a weekend
-                    if birthday_this_year.weekday() == 5:
-                        congratulation_date = birthday_this_year + timedelta(days=2)
-                    elif birthday_this_year.weekday() == 6:
-                        congratulation_date = birthday_this_year + timedelta(days=1)
-                    else:
-                        congratulation_date = birthday_this_year
-
-                    list_of_birthdays.append({ 
-                        "name": record.name.value,
-                        "congratulation_date": congratulation_date.strftime("%d.%m.%Y")
-                    })
+
+        # Only the slots for today and the next 7 days need checking
+        for days_ahead in range(8):
+            birthday_this_year = today + timedelta(days=days_ahead)
+            names = index.get((birthday_this_year.month, birthday_this_year.day))
+            if not names:
+                continue
+            # Move weekend birthdays to the following Monday
+            congratulation_date = birthday_this_year + timedelta(days=WEEKEND_SHIFT[birthday_this_year.weekday()])
+            for name in names:
+                list_of_birthdays.append({ 
+                    "name": name,
+                    "congratulation_date": congratulation_date.strftime("%d.%m.%Y")
+                })
         return list_of_birthdays
 
 # Decorator for error handling
@@ -155,14 +352,16 @@ def add_contact(book: AddressBook, args: str) -> str:
         record = Record(name)
         book.add_record(record)
     for p in phones:
-        record.add_phone(p)
+        book.add_phone(record, p)
     return "Contact added."
 
 # Changing a contact with error handling
 @input_error
 def change_contact(book: AddressBook, name: str, old_phone: str, new_phone: str) -> str:
     record = book.find(name)
-    if record and record.edit_phone(old_phone, new_phone):
+    if record and new_phone != old_phone and record.find_phone(new_phone):
+        return "Phone number already exists."
+    if record and book.edit_phone(record, old_phone, new_phone):
         return "Contact updated."
     return "Contact not found."
 
@@ -171,7 +370,7 @@ def change_contact(book: AddressBook, name: str, old_phone: str, new_phone: str)
 def show_phone(book: AddressBook, name: str) -> str:
     record = book.find(name)
     if record:
-        return ', '.join(phone.value for phone in record.phones)
+        return ', '.join(record.phones)
     return "Contact not found."
 
 # Showing all contacts with error handling
@@ -193,7 +392,7 @@ def remove_contact(book: AddressBook, name: str) -> str:
 def add_birthday(book: AddressBook, name: str, birthday: str) -> str:
     record = book.find(name)
     if record:
-        record.add_birthday(birthday)
+        book.add_birthday(record, birthday)
         return "Birthday added."
     return "Contact not found."
 
@@ -216,22 +415,99 @@ def birthdays(book: AddressBook) -> str:
 # Parsing user input
 def parse_input(user_input: str) -> (str, List[str]):
     parts = user_input.strip().split(maxsplit=3)
+    if not parts:
+        return "", []   # Empty line
     command = parts[0].lower()
     args = parts[1:]
     return command, args
 
+# Buffer size for reading and writing the address book file
+IO_BUFFER_SIZE = 1 << 20
+# Journal size after which exiting writes a fresh snapshot and clears the journal
+JOURNAL_SNAPSHOT_SIZE = 1 << 16
+# Pickle protocol 5 (Python 3.8+) keeps the file format the same across interpreters
+PICKLE_PROTOCOL = 5
+
+# Pausing the garbage collector while many objects are created at once
+@contextmanager
+def gc_paused():
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
 # Functions for serialization and deserialization
 def save_data(book, filename="addressbook.pkl"):
-    with open(filename, "wb") as f:
-        pickle.dump(book, f)
+    # Write to a temporary file and swap it in, so a crash never leaves a torn file
+    tmp_filename = filename + ".tmp"
+    # The new snapshot gets the next generation, so the current journal is ignored against it
+    book._generation += 1
+    try:
+        with open(tmp_filename, "wb", buffering=IO_BUFFER_SIZE) as f:
+            with gc_paused():
+                pickle.Pickler(f, protocol=PICKLE_PROTOCOL).dump(book)
+            if not os.environ.get("FAST_SAVE"):
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        book._generation -= 1
+        raise
+    book._dirty = False
+    # The snapshot now holds every journaled change
+    if book._journal:
+        open(book._journal, "w").close()
 
 def load_data(filename="addressbook.pkl"):
+    with gc_paused():
+        book = load_snapshot(filename)
+        book._journal = os.path.splitext(filename)[0] + ".log"
+        book.replay_journal()
+    return book
+
+# Checking whether the snapshot should be rewritten before exiting
+def needs_snapshot(book):
+    if not book._dirty:
+        return False
+    if not book._journal:
+        return True   # Changes were not journaled
+    try:
+        return os.path.getsize(book._journal) >= JOURNAL_SNAPSHOT_SIZE
+    except FileNotFoundError:
+        return True
+
+def load_snapshot(filename="addressbook.pkl"):
     try:
-        with open(filename, "rb") as f:
-            return pickle.load(f)
+        with open(filename, "rb", buffering=0) as raw:
+            try:
+                mm = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty or unmappable file: fall back to a buffered read
+                with io.BufferedReader(raw, buffer_size=IO_BUFFER_SIZE) as f:
+                    return pickle.Unpickler(f).load()
+            with mm:
+                return pickle.loads(mm)
     except FileNotFoundError:
         return AddressBook()   # Return a new address book if the file is not found 
 
+# Command handlers, each called with the book and the parsed arguments
+HANDLERS = {
+    "hello": lambda book, args: "How can I help you?",
+    "add": lambda book, args: add_contact(book, args),
+    "change": lambda book, args: change_contact(book, *args),
+    "phone": lambda book, args: show_phone(book, *args),
+    "all": lambda book, args: show_all(book),
+    "remove": lambda book, args: remove_contact(book, *args),
+    "add-birthday": lambda book, args: add_birthday(book, *args),
+    "show-birthday": lambda book, args: show_birthday(book, *args),
+    "birthdays": lambda book, args: birthdays(book),
+}
+
+EXIT_COMMANDS = ("exit", "close")
+
 # Main function
 def main():
     book = load_data()   # Load address book at startup
@@ -240,30 +516,13 @@ def main():
         user_input = input("Menu:\n1- add\n2- change \n3- phone \n4- all \n5- remove\n6- add-birthday\n7- show-birthday\n8- birthdays\n9- exit or close\n10- hello\ncommand: ")
         command, args = parse_input(user_input)
 
-        if command == "hello":
-            print("How can I help you?")
-        elif command == "add":
-            print(add_contact(book, args))
-        elif command == "change":
-            print(change_contact(book, *args))
-        elif command == "phone":
-            print(show_phone(book, *args))
-        elif command == "all":
-            print(show_all(book))
-        elif command == "remove":
-            print(remove_contact(book, *args))
-        elif command == "add-birthday":
-            print(add_birthday(book, *args))
-        elif command == "show-birthday":
-            print(show_birthday(book, *args))
-        elif command == "birthdays":
-            print(birthdays(book))
-        elif command in ("exit", "close"):
-            save_data(book)  # Save address book before exiting
+        if command in EXIT_COMMANDS:
+            if needs_snapshot(book):
+                save_data(book)  # Save address book before exiting
             print("Good bye!")
             break
-        else:
-            print("Invalid command.")
+        handler = HANDLERS.get(command)
+        print(handler(book, args) if handler else "Invalid command.")
 
 if __name__ == "__main__":
     main()